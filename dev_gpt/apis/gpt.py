@@ -1,8 +1,9 @@
 import json
 import os
 from copy import deepcopy
+from functools import lru_cache
 from time import sleep
-from typing import List, Any
+from typing import List, Any, Callable
 
 import openai
 from langchain import PromptTemplate
@@ -112,6 +113,30 @@ class AssistantStreamingStdOutCallbackHandler(StreamingStdOutCallbackHandler):
         print_colored('', token, 'green', end='')
 
 
+class _StopStreaming(Exception):
+    def __init__(self, content: str):
+        super().__init__()
+        self.content = content
+
+
+class StopConditionCallbackHandler(StreamingStdOutCallbackHandler):
+    """Stops streaming the response as soon as the content streamed so far fulfills the stop condition."""
+
+    def __init__(self, stop_condition: Callable[[str], bool]):
+        self.stop_condition = stop_condition
+        self.content_so_far = ''
+
+    @property
+    def always_verbose(self) -> bool:
+        return True
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.content_so_far += token
+        # the stop conditions are about closed code blocks, therefore they are only checked when a backtick arrives
+        if '`' in token and self.stop_condition(self.content_so_far):
+            raise _StopStreaming(self.content_so_far)
+
+
 class _GPTConversation:
     def __init__(self, model: str, cost_callback, messages: List[BaseMessage], print_stream, print_costs, conversation_logger: ConversationLogger = None):
         self._chat = ChatOpenAI(
@@ -139,7 +164,15 @@ class _GPTConversation:
                 elif isinstance(message, AIMessage):
                     print_colored(f'{t} - ({i}) assistant - prompt', message.content, 'green')
 
-    def chat(self, prompt: str, role: str = 'user'):
+    def chat(self, prompt: str, role: str = 'user', stop_condition: Callable[[str], bool] = None):
+        """Sends the prompt and returns the response of the assistant.
+
+        Args:
+            prompt (str): The prompt to send.
+            role (str, optional): The role of the prompt - 'user' or 'system'. Defaults to 'user'.
+            stop_condition (Callable, optional): Receives the response streamed so far. Once it returns True, the
+                streaming is stopped and the response streamed so far is returned. Defaults to None.
+        """
         MassageClass = HumanMessage if role == 'user' else SystemMessage
         chat_message = MassageClass(content=prompt)
         self.messages.append(chat_message)
@@ -148,15 +181,25 @@ class _GPTConversation:
             print_colored(f'{Timer().get_time_since_start()} - assistant', '', 'green', end='')
         print('thinking...')
         for i in range(10):
+            stop_condition_handler = StopConditionCallbackHandler(stop_condition) if stop_condition else None
+            if stop_condition_handler:
+                self._chat.callback_manager.add_handler(stop_condition_handler)
             try:
                 response = self._chat(self.messages)
                 self.conversation_logger.log(self.messages, response)
                 break
+            except _StopStreaming as e:
+                response = AIMessage(content=e.content)
+                self.conversation_logger.log(self.messages, response)
+                break
             except (RateLimitError, openai.error.APIError, ConnectionError, InvalidChunkLength, ChunkedEncodingError, APIError, openai.error.Timeout) as e:
                 print('There was a connection error. Retrying...')
                 if i == 9:
                     raise e
                 sleep(10)
+            finally:
+                if stop_condition_handler:
+                    self._chat.callback_manager.remove_handler(stop_condition_handler)
 
         if os.environ['VERBOSE'].lower() == 'true':
             print()
@@ -166,11 +209,15 @@ class _GPTConversation:
 
     @staticmethod
     def _create_system_message(task_description, test_description) -> SystemMessage:
-        system_message = PromptTemplate.from_template(template_system_message_base).format(
-            # task_description=task_description,
-            # test_description=test_description,
-        )
-        return SystemMessage(content=system_message)
+        # task_description and test_description are intentionally not part of the system message.
+        # They are sent within the user prompts, which keeps the system message byte-identical across all requests
+        # so that OpenAI can serve it from its prompt prefix cache.
+        return SystemMessage(content=_static_system_message_content())
+
+
+@lru_cache(maxsize=1)
+def _static_system_message_content() -> str:
+    return PromptTemplate.from_template(template_system_message_base).format()
 
 
 def ask_gpt(prompt_template: str, parser=identity_parser, **kwargs):
@@ -52,6 +52,7 @@ def clean_requirements_txt(previous_microservice_path):
     It can happen that the generated requirements.txt contains packages that are not on PyPI (like base64).
     In this case, we remove the requirement from requirements.txt.
     In case the package is on PyPI, but the version is not, we update the version to the latest version that is still not older than 2021.
+    Returns the cleaned content of requirements.txt.
     """
     requirements_txt_path = os.path.join(previous_microservice_path, 'requirements.txt')
     with open(requirements_txt_path, 'r', encoding='utf-8') as f:
@@ -88,5 +89,7 @@ def clean_requirements_txt(previous_microservice_path):
             else:
                 updated_requirements.append(line)
 
+    cleaned_requirements_txt = '\n'.join(updated_requirements)
     with open(requirements_txt_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(updated_requirements))
+        f.write(cleaned_requirements_txt)
+    return cleaned_requirements_txt
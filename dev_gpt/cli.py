@@ -4,14 +4,13 @@ import os
 
 import click
 
-from dev_gpt.apis.gpt import configure_openai_api_key
-from dev_gpt.apis.jina_cloud import jina_auth_login
 from dev_gpt.options.configure.key_handling import set_api_key
 from dev_gpt.options.generate.conversation_logger import Timer
 
 
 def openai_api_key_needed(func):
     def wrapper(*args, **kwargs):
+        from dev_gpt.apis.gpt import configure_openai_api_key
         configure_openai_api_key()
         return func(*args, **kwargs)
     return wrapper
@@ -88,6 +87,7 @@ def run(path):
 @main.command()
 @path_param
 def deploy(path):
+    from dev_gpt.apis.jina_cloud import jina_auth_login
     jina_auth_login()
     from dev_gpt.options.deploy.deployer import Deployer
     path = os.path.expanduser(path)
@@ -1,7 +1,8 @@
 import json
-from typing import List
+from typing import List, TYPE_CHECKING
 
-from langchain.schema import BaseMessage
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
 
 
 class ConversationLogger:
@@ -9,7 +10,7 @@ class ConversationLogger:
         self.log_file_path = log_file_path
         self.log_file = []
 
-    def log(self, prompt_message_list: List[BaseMessage], response: str):
+    def log(self, prompt_message_list: List['BaseMessage'], response: str):
         prompt_list_json = [
             {
                 'role': f'{message.type}',
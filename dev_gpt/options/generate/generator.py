@@ -1,15 +1,17 @@
 import json
 import os
-import random
 import re
+import secrets
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Callable
 from typing import List, Text, Optional
 
 from langchain import PromptTemplate
 from langchain.schema import SystemMessage, AIMessage
-from pydantic.dataclasses import dataclass
 
 from dev_gpt.apis import gpt
 from dev_gpt.apis.gpt import _GPTConversation, ask_gpt
@@ -33,9 +35,45 @@ from dev_gpt.options.generate.templates_user import template_generate_microservi
     template_suggest_solutions_code_issue, template_was_error_seen_before, \
     template_was_solution_tried_before, response_format_was_error_seen_before, \
     response_format_was_solution_tried_before, response_format_suggest_solutions
-from dev_gpt.utils.io import persist_file, get_all_microservice_files_with_content, get_microservice_path
+from dev_gpt.utils.cache import cache_response, strip_build_log_timestamps
+from dev_gpt.utils.io import persist_file, persist_files, get_all_microservice_files_with_content, get_microservice_path
 from dev_gpt.utils.string_tools import print_colored
 
+_SINGLE_BLOCK_RE = re.compile(r"```(?:\w+\n)?([\s\S]*?)```", re.MULTILINE)
+_NO_DEPENDENCY_ISSUE_RE = re.compile(r'AttributeError|NameError|AssertionError|TypeError|SyntaxError')
+_PACKAGE_MANAGER_TO_DEPENDENCY_ISSUE_RE = {
+    'pip': re.compile(
+        r'ModuleNotFoundError|ImportError|No matching distribution found|Could not find a version that satisfies the requirement'
+    ),
+    'apt-get': re.compile(r'Unable to locate package|has no installation candidate|cannot open shared object file'),
+}
+
+
+@lru_cache(maxsize=64)
+def _files_block_re(file_names):
+    # only the given file names are accepted as header, so that other code blocks can not be mistaken for a file block
+    file_names_alternation = '|'.join(re.escape(file_name) for file_name in file_names)
+    return re.compile(
+        fr"(?:\*|\*\*| )({file_names_alternation})\*?\*?\n```(?:\w+\n)?([\s\S]*?)\n```",
+        re.MULTILINE
+    )
+
+
+@lru_cache(maxsize=64)
+def _file_block_re(file_name, can_contain_code_block=True):
+    optional_line_break = '\n' if can_contain_code_block else ''  # the \n at the end makes sure that ``` within the generated code is not matched because it is not right before a line break
+    return re.compile(
+        fr"(?:\*|\*\*| ){re.escape(file_name)}\*?\*?\n```(?:\w+\n)?([\s\S]*?){optional_line_break}```",
+        re.MULTILINE
+    )
+
+
+def _is_file_block_complete(file_name):
+    """Returns a stop condition for streamed responses that is fulfilled once the first block of file_name is closed.
+    The first block wins, therefore it must only be used when exactly one block of file_name is expected.
+    """
+    return lambda text: _file_block_re(file_name).search(text) is not None
+
 
 @dataclass
 class TaskSpecification:
@@ -50,26 +88,33 @@ class Generator:
         self.self_healing = self_healing
         self.microservice_root_path = path
         self.microservice_name = None
-        self.previous_microservice_path = None
         self.cur_microservice_path = None
         self.previous_errors = []
         self.previous_solutions = []
 
     @staticmethod
     def extract_content_from_result(plain_text, file_name, match_single_block=False, can_contain_code_block=True):
-        optional_line_break = '\n' if can_contain_code_block else ''  # the \n at the end makes sure that ``` within the generated code is not matched because it is not right before a line break
-        pattern = fr"(?:\*|\*\*| ){file_name}\*?\*?\n```(?:\w+\n)?([\s\S]*?){optional_line_break}```"
-        matches = re.findall(pattern, plain_text, re.MULTILINE)
+        matches = _file_block_re(file_name, can_contain_code_block).findall(plain_text)
         if matches:
             return matches[-1].strip()
         elif match_single_block:
-            # Check for a single code block
-            single_code_block_pattern = r"```(?:\w+\n)?([\s\S]*?)```"
-            single_code_block_match = re.findall(single_code_block_pattern, plain_text, re.MULTILINE)
-            if len(single_code_block_match) == 1:
-                return single_code_block_match[0].strip()
+            # Check for a single code block - stop scanning as soon as a second one is found
+            single_code_block_matches = _SINGLE_BLOCK_RE.finditer(plain_text)
+            first_match = next(single_code_block_matches, None)
+            if first_match is not None and next(single_code_block_matches, None) is None:
+                return first_match.group(1).strip()
         return ''
 
+    @staticmethod
+    def extract_files_from_result(plain_text, file_names):
+        """Extracts the content of all the given files in a single pass over plain_text.
+        Files that are not contained in plain_text are omitted. If a file occurs multiple times, the last occurrence is used.
+        """
+        file_name_to_content = {}
+        for match in _files_block_re(tuple(file_names)).finditer(plain_text):
+            file_name_to_content[match.group(1)] = match.group(2).strip()
+        return {file_name: content for file_name, content in file_name_to_content.items() if content != ''}
+
     def write_config_yml(self, class_name, dest_folder, python_file=EXECUTOR_FILE_NAME):
         config_content = f'''jtype: {class_name}
 py_modules:
@@ -80,15 +125,18 @@ metas:
         with open(os.path.join(dest_folder, 'config.yml'), 'w', encoding='utf-8') as f:
             f.write(config_content)
 
-    def files_to_string(self, file_name_to_content, restrict_keys=None):
-        all_microservice_files_string = ''
-        for file_name, tag in FILE_AND_TAG_PAIRS:
-            if file_name in file_name_to_content and (not restrict_keys or file_name in restrict_keys):
-                all_microservice_files_string += f'**{file_name}**\n```{tag}\n{file_name_to_content[file_name]}\n```\n\n'
-        return all_microservice_files_string.strip()
+    @staticmethod
+    def files_to_string(file_name_to_content, restrict_keys=None):
+        return '\n\n'.join(
+            f'**{file_name}**\n```{tag}\n{file_name_to_content[file_name]}\n```'
+            for file_name, tag in FILE_AND_TAG_PAIRS
+            if file_name in file_name_to_content and (not restrict_keys or file_name in restrict_keys)
+        )
 
     def get_default_parse_result_fn(self, files_names: List[str]):
         def _default_parse_result_fn(x):
+            if len(files_names) > 1:
+                return self.extract_files_from_result(x, files_names)
             _parsed_results = {}
             for _file_name in files_names:
                 _content = self.extract_content_from_result(x, _file_name, match_single_block=len(files_names) == 1)
@@ -108,6 +156,7 @@ metas:
             use_custom_system_message: bool = True,
             response_format_example: str = None,
             post_process_fn: Callable = None,
+            stop_after_file_block: bool = False,
             **template_kwargs
     ):
         """This function generates file(s) using the given template and persists it/them in the given destination folder.
@@ -123,6 +172,9 @@ metas:
                 mapping file_name to its content. If no content could be extract, it returns an empty dictionary.
                 Defaults to None. If None, default parsing is used which uses the file_name to extract from the generated content.
             use_custom_system_message (bool, optional): whether to use custom system message or not. Defaults to True.
+            stop_after_file_block (bool, optional): whether to stop streaming the response once the first block of the
+                file is closed. Only set it for templates that ask for exactly one block of a single file, otherwise a
+                draft might be returned instead of the final block. Defaults to False.
             **template_kwargs: The keyword arguments to be passed to the template.
         """
         if destination_folder is None:
@@ -145,10 +197,12 @@ metas:
         template_kwargs = {k: v for k, v in template_kwargs.items() if k in template.input_variables}
         if 'file_name' in template.input_variables and len(file_name_s) == 1:
             template_kwargs['file_name'] = file_name_s[0]
+        stop_condition = _is_file_block_complete(file_name_s[0]) if stop_after_file_block and len(file_name_s) == 1 else None
         content_raw = conversation.chat(
             template.format(
                 **template_kwargs
-            )
+            ),
+            stop_condition=stop_condition,
         )
         content = parse_result_fn(content_raw)
         if post_process_fn is not None:
@@ -179,11 +233,11 @@ metas:
             content_raw = conversation.chat(
                 'Based on your previous response, only output the content' + (f' for `{file_name_s[0]}`' if len(file_name_s) == 1 else '') +
                 '. Like this:\n' +
-                file_wrapping_example
+                file_wrapping_example,
+                stop_condition=stop_condition,
             )
             content = parse_result_fn(content_raw)
-        for _file_name, _file_content in content.items():
-            persist_file(_file_content, os.path.join(destination_folder, _file_name))
+        persist_files(content, destination_folder)
         return content
 
     def generate_microservice(
@@ -218,6 +272,7 @@ metas:
             tag_name=IMPLEMENTATION_FILE_TAG,
             file_name_s=[IMPLEMENTATION_FILE_NAME],
             post_process_fn=self.add_missing_imports_post_process_fn,
+            stop_after_file_block=True,
         )[IMPLEMENTATION_FILE_NAME]
 
         test_microservice_content = self.generate_and_persist_file(
@@ -231,6 +286,7 @@ metas:
             tag_name=TEST_EXECUTOR_FILE_TAG,
             file_name_s=[TEST_EXECUTOR_FILE_NAME],
             post_process_fn=self.add_missing_imports_post_process_fn,
+            stop_after_file_block=True,
         )[TEST_EXECUTOR_FILE_NAME]
 
         self.generate_and_persist_file(
@@ -244,6 +300,7 @@ metas:
             file_name_s=[REQUIREMENTS_FILE_NAME],
             parse_result_fn=self.parse_result_fn_requirements,
             tag_name=REQUIREMENTS_FILE_TAG,
+            stop_after_file_block=True,
         )
 
         with open(os.path.join(os.path.dirname(__file__), 'static_files', 'microservice', 'Dockerfile'), 'r',
@@ -308,6 +365,37 @@ pytest
     def generate_playground(self):
         print_colored('', '\n\n############# Playground #############', 'blue')
 
+        static_gateway_path = os.path.join(os.path.dirname(__file__), 'static_files', 'gateway')
+        gateway_path = os.path.join(self.cur_microservice_path, 'gateway')
+        # the static gateway files are copied in the background while the playground is generated
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            copy_future = executor.submit(
+                shutil.copytree, static_gateway_path, gateway_path, ignore=shutil.ignore_patterns('custom_gateway.py')
+            )
+            playground_content = self.generate_playground_content()
+            copy_future.result()
+        persist_file(playground_content, os.path.join(gateway_path, 'app.py'))
+
+        # fill-in name of microservice
+        gateway_name = f'Gateway{self.microservice_name}'
+        with open(os.path.join(static_gateway_path, 'custom_gateway.py'), 'r', encoding='utf-8') as f:
+            custom_gateway_content = f.read()
+        custom_gateway_content = custom_gateway_content.replace(
+            'class CustomGateway(CompositeGateway):',
+            f'class {gateway_name}(CompositeGateway):'
+        )
+        persist_file(custom_gateway_content, os.path.join(gateway_path, 'custom_gateway.py'))
+
+        # write config.yml
+        self.write_config_yml(gateway_name, gateway_path, 'custom_gateway.py')
+
+        # push the gateway
+        print('Final step...')
+        hubble_log = push_executor(gateway_path)
+        if not is_executor_in_hub(gateway_name):
+            raise Exception(f'{self.microservice_name} not in hub. Hubble logs: {hubble_log}')
+
+    def generate_playground_content(self):
         with open(os.path.join(os.path.dirname(__file__), 'static_files', 'gateway', 'app_template.py'), 'r', encoding='utf-8') as f:
             playground_template = f.read()
         file_name_to_content = get_all_microservice_files_with_content(self.cur_microservice_path)
@@ -324,47 +412,28 @@ pytest
                 file_name_purpose='app.py/the playground',
                 file_name='app.py',
                 tag_name='python',
-            )
+            ),
+            stop_condition=_is_file_block_complete('app.py'),
         )
         playground_content = self.extract_content_from_result(playground_content_raw, 'app.py', match_single_block=True)
         if playground_content == '':
-            content_raw = conversation.chat(f'You must add the app.py code. You most not output any other code')
+            content_raw = conversation.chat(
+                f'You must add the app.py code. You most not output any other code',
+                stop_condition=_is_file_block_complete('app.py'),
+            )
             playground_content = self.extract_content_from_result(
                 content_raw, 'app.py', match_single_block=True
             )
-        playground_content = self.add_missing_imports_for_file(playground_content)
-
-        gateway_path = os.path.join(self.cur_microservice_path, 'gateway')
-        shutil.copytree(os.path.join(os.path.dirname(__file__), 'static_files', 'gateway'), gateway_path)
-        persist_file(playground_content, os.path.join(gateway_path, 'app.py'))
-
-        # fill-in name of microservice
-        gateway_name = f'Gateway{self.microservice_name}'
-        custom_gateway_path = os.path.join(gateway_path, 'custom_gateway.py')
-        with open(custom_gateway_path, 'r', encoding='utf-8') as f:
-            custom_gateway_content = f.read()
-        custom_gateway_content = custom_gateway_content.replace(
-            'class CustomGateway(CompositeGateway):',
-            f'class {gateway_name}(CompositeGateway):'
-        )
-        with open(custom_gateway_path, 'w', encoding='utf-8') as f:
-            f.write(custom_gateway_content)
-
-        # write config.yml
-        self.write_config_yml(gateway_name, gateway_path, 'custom_gateway.py')
-
-        # push the gateway
-        print('Final step...')
-        hubble_log = push_executor(gateway_path)
-        if not is_executor_in_hub(gateway_name):
-            raise Exception(f'{self.microservice_name} not in hub. Hubble logs: {hubble_log}')
+        return self.add_missing_imports_for_file(playground_content)
 
     def debug_microservice(self, num_approach, packages, self_healing):
+        # the files of the current version are kept in memory and updated alongside the persisted files
+        file_name_to_content = get_all_microservice_files_with_content(self.cur_microservice_path)
         for i in range(1, MAX_DEBUGGING_ITERATIONS):
             print('Debugging iteration', i)
             print('Trying to debug the microservice. Might take a while...')
             print(f'{Timer().get_time_since_start()} - Clean requirements.txt...')
-            clean_requirements_txt(self.cur_microservice_path)
+            file_name_to_content[REQUIREMENTS_FILE_NAME] = clean_requirements_txt(self.cur_microservice_path)
             print(f'{Timer().get_time_since_start()} - Build executor...')
             log_hubble = push_executor(self.cur_microservice_path)
             print(f'{Timer().get_time_since_start()} - Analyze logs...')
@@ -375,12 +444,11 @@ pytest
                     print(error)
                     raise Exception('Self-healing is disabled. Please fix the error manually.')
                 print('An error occurred during the build process. Feeding the error back to the assistant...')
-                self.previous_microservice_path = self.cur_microservice_path
                 self.cur_microservice_path = get_microservice_path(
                     self.microservice_root_path, self.microservice_name, packages, num_approach, i + 1
                 )
                 os.makedirs(self.cur_microservice_path)
-                self.do_debug_iteration(error)
+                self.do_debug_iteration(error, file_name_to_content)
                 if i == MAX_DEBUGGING_ITERATIONS - 1:
                     raise self.MaxDebugTimeReachedException('Could not debug the microservice.')
             else:
@@ -392,10 +460,11 @@ pytest
                 else:
                     raise Exception(f'{self.microservice_name} not in hub. Hubble logs: {log_hubble}')
 
-    def do_debug_iteration(self, error):
-        file_name_to_content = get_all_microservice_files_with_content(self.previous_microservice_path)
-        for file_name, content in file_name_to_content.items():
-            persist_file(content, os.path.join(self.cur_microservice_path, file_name))
+    def do_debug_iteration(self, error, file_name_to_content):
+        """Copies the files of the previous version into the current version and fixes the error there.
+        file_name_to_content holds the files of the previous version and is updated in place with the fixed files.
+        """
+        persist_files(file_name_to_content, self.cur_microservice_path)
 
         summarized_error = self.summarize_error(error)
         dock_req_string = self.files_to_string({
@@ -405,25 +474,26 @@ pytest
 
         is_apt_get_dependency_issue = self.is_dependency_issue(summarized_error, dock_req_string, 'apt-get')
         if is_apt_get_dependency_issue:
-            self.generate_and_persist_file(
+            file_name_to_content.update(self.generate_and_persist_file(
                 section_title='Debugging apt-get dependency issue',
                 template=template_solve_apt_get_dependency_issue,
                 file_name_s=['apt-get-packages.json'],
                 parse_result_fn=self.parse_result_fn_dockerfile,
+                stop_after_file_block=True,
                 summarized_error=summarized_error,
                 all_files_string=dock_req_string,
-            )
+            ))
             print('Dockerfile updated')
         else:
             is_pip_dependency_issue = self.is_dependency_issue(summarized_error, dock_req_string, 'PIP')
             if is_pip_dependency_issue:
-                self.generate_and_persist_file(
+                file_name_to_content.update(self.generate_and_persist_file(
                     section_title='Debugging pip dependency issue',
                     template=template_solve_pip_dependency_issue,
                     file_name_s=[REQUIREMENTS_FILE_NAME],
                     summarized_error=summarized_error,
                     all_files_string=dock_req_string,
-                )
+                ))
             else:
                 all_files_string = self.files_to_string(
                     {key: val for key, val in file_name_to_content.items() if key != EXECUTOR_FILE_NAME}
@@ -431,7 +501,7 @@ pytest
 
                 suggested_solution = self.generate_solution_suggestion(summarized_error, all_files_string)
 
-                self.generate_and_persist_file(
+                file_name_to_content.update(self.generate_and_persist_file(
                     section_title='Implementing suggestion solution for code issue',
                     template=template_implement_solution_code_issue,
                     file_name_s=[IMPLEMENTATION_FILE_NAME, TEST_EXECUTOR_FILE_NAME, REQUIREMENTS_FILE_NAME],
@@ -440,7 +510,7 @@ pytest
                     test_description=self.microservice_specification.test,
                     all_files_string=all_files_string,
                     suggested_solution=suggested_solution,
-                )
+                ))
 
                 self.previous_errors.append(summarized_error)
                 self.previous_solutions.append(suggested_solution)
@@ -465,6 +535,7 @@ pytest
                     previous_errors='- "' + f'"{os.linesep}- "'.join(self.previous_errors) + '"',
                     use_custom_system_message=False,
                     response_format_example=response_format_was_error_seen_before,
+                    stop_after_file_block=True,
                 )['was_error_seen_before.json']
             )['was_error_seen_before'].lower() == 'yes'
 
@@ -481,6 +552,7 @@ pytest
                             suggested_solution=_suggested_solution,
                             use_custom_system_message=False,
                             response_format_example=response_format_was_solution_tried_before,
+                            stop_after_file_block=True,
                         )['will_lead_to_different_actions.json']
                     )['will_lead_to_different_actions'].lower() == 'no'
                     if not was_solution_tried_before:
@@ -499,21 +571,23 @@ pytest
     class MaxDebugTimeReachedException(BaseException):
         pass
 
+    @cache_response()
     def is_dependency_issue(self, summarized_error, dock_req_string: str, package_manager: str):
-        # a few heuristics to quickly jump ahead
-        if any([error_message in summarized_error for error_message in
-                ['AttributeError', 'NameError', 'AssertionError']]):
-            return False
-        if package_manager.lower() == 'pip' and any(
-                [em in summarized_error for em in ['ModuleNotFoundError', 'ImportError']]):
+        # a few heuristics to quickly jump ahead - failing installations are checked first since they break the build
+        # even if the log contains errors of the code as well
+        dependency_issue_re = _PACKAGE_MANAGER_TO_DEPENDENCY_ISSUE_RE.get(package_manager.lower())
+        if dependency_issue_re is not None and dependency_issue_re.search(summarized_error):
             return True
+        if _NO_DEPENDENCY_ISSUE_RE.search(summarized_error):
+            return False
 
         print_colored('', f'Is it a {package_manager} dependency issue?', 'blue')
         conversation = self.gpt_session.get_conversation()
         answer_raw = conversation.chat(
             template_is_dependency_issue.format(summarized_error=summarized_error,
                                                 all_files_string=dock_req_string).replace('PACKAGE_MANAGER',
-                                                                                          package_manager)
+                                                                                          package_manager),
+            stop_condition=_is_file_block_complete('response.json'),
         )
         answer_json_string = self.extract_content_from_result(answer_raw, 'response.json', match_single_block=True, )
         answer = json.loads(answer_json_string)['dependency_installation_failure']
@@ -544,7 +618,7 @@ pytest
         os.makedirs(self.microservice_root_path)
         self.microservice_specification.task, self.microservice_specification.test = PM().refine_specification(self.microservice_specification.task)
         generated_name = self.generate_microservice_name(self.microservice_specification.task)
-        self.microservice_name = f'{generated_name}{random.randint(0, 10_000_000)}'
+        self.microservice_name = f'{generated_name}{secrets.token_hex(4)}'
         packages_list = self.get_possible_packages()
         for num_approach, packages in enumerate(packages_list):
             try:
@@ -568,6 +642,7 @@ You can now run or deploy your microservice:
                   )
             return 0
 
+    @cache_response(normalize_fn=strip_build_log_timestamps)
     def summarize_error(self, error):
         conversation = self.gpt_session.get_conversation()
         error_summary = conversation.chat(template_summarize_error.format(error=error))
@@ -592,14 +667,21 @@ You can now run or deploy your microservice:
             ])
         ]
         # filter out single packages
+        tools = ['gpt_3_5_turbo', 'google_custom_search']
+        packages_to_look_up = list({
+            package for packages in packages_list for package in packages
+            if package not in UNNECESSARY_PACKAGES and package not in tools
+        })
+        # the pypi look-ups are independent network requests, therefore they are done concurrently
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            package_to_is_on_pypi = dict(zip(packages_to_look_up, executor.map(is_package_on_pypi, packages_to_look_up)))
         packages_list = [
             [
                 package for package in packages
                 if (package not in UNNECESSARY_PACKAGES)
                    and (  # all packages must be on pypi or it is gpt_3_5_turbo
-                           is_package_on_pypi(package)
-                           or package == 'gpt_3_5_turbo'
-                           or package == 'google_custom_search'
+                           package in tools
+                           or package_to_is_on_pypi[package]
                    )
             ] for packages in packages_list
         ]
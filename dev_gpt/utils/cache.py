@@ -0,0 +1,39 @@
+import functools
+import hashlib
+import json
+import re
+
+_BUILD_LOG_TIMESTAMP_RE = re.compile(r'^(#\d+) \d+\.\d+ ', re.MULTILINE)
+
+
+def strip_build_log_timestamps(text):
+    """Removes the timing info of docker build log lines (e.g. "#15 3.142 ") that differs between otherwise identical logs."""
+    return _BUILD_LOG_TIMESTAMP_RE.sub(r'\1 ', text)
+
+
+def cache_response(normalize_fn=None):
+    """Caches the return value of a method per instance for identical arguments.
+    It is meant for methods that ask GPT with temperature 0 where the same input leads to the same answer.
+    The cache key is the sha256 hash of the (optionally normalized) arguments.
+
+    Args:
+        normalize_fn (Callable, optional): applied to each string argument before computing the cache key.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            cache = self.__dict__.setdefault('_response_cache', {})
+            key_args = [normalize_fn(arg) if normalize_fn and isinstance(arg, str) else arg for arg in args]
+            key_kwargs = {
+                k: normalize_fn(v) if normalize_fn and isinstance(v, str) else v for k, v in kwargs.items()
+            }
+            key = hashlib.sha256(
+                json.dumps([fn.__name__, key_args, key_kwargs], sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest()
+            if key not in cache:
+                cache[key] = fn(self, *args, **kwargs)
+            return cache[key]
+
+        return wrapper
+
+    return decorator
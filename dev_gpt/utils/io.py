@@ -3,6 +3,7 @@ import re
 
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 
@@ -17,6 +18,22 @@ def persist_file(file_content, file_path):
         f.write(file_content)
 
 
+def persist_files(file_name_to_content, folder_path):
+    """Persists all files in folder_path. Multiple files are written concurrently to hide the latency of slow file systems."""
+    if len(file_name_to_content) <= 1:
+        for file_name, file_content in file_name_to_content.items():
+            persist_file(file_content, os.path.join(folder_path, file_name))
+        return
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # list() makes sure that exceptions raised while writing are propagated
+        list(executor.map(
+            lambda file_name_and_content: persist_file(
+                file_name_and_content[1], os.path.join(folder_path, file_name_and_content[0])
+            ),
+            file_name_to_content.items()
+        ))
+
+
 def get_all_microservice_files_with_content(folder_path):
     file_name_to_content = {}
     for filename in os.listdir(folder_path):
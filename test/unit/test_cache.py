@@ -0,0 +1,20 @@
+from dev_gpt.utils.cache import cache_response, strip_build_log_timestamps
+
+
+class CountingAnswerer:
+    def __init__(self):
+        self.num_calls = 0
+
+    @cache_response(normalize_fn=strip_build_log_timestamps)
+    def answer(self, question):
+        self.num_calls += 1
+        return f'answer {self.num_calls}'
+
+
+def test_cache_response():
+    answerer = CountingAnswerer()
+    assert answerer.answer('#15 3.142 KeyError') == 'answer 1'
+    assert answerer.answer('#15 4.780 KeyError') == 'answer 1'
+    assert answerer.answer('#15 4.780 NameError') == 'answer 2'
+    assert answerer.num_calls == 2
+    assert CountingAnswerer().answer('#15 3.142 KeyError') == 'answer 1'
@@ -0,0 +1,21 @@
+import pytest
+
+from dev_gpt.options.generate.generator import Generator
+
+
+@pytest.mark.parametrize(
+    'summarized_error, package_manager, expected',
+    [
+        ("ModuleNotFoundError: No module named 'cv2'", 'PIP', True),
+        ('ERROR: No matching distribution found for foo', 'PIP', True),
+        ('SyntaxError: Missing parentheses in call to print\nERROR: No matching distribution found for foo', 'PIP', True),
+        ('ImportError: libGL.so.1: cannot open shared object file: No such file or directory', 'apt-get', True),
+        ('E: Unable to locate package libfoo', 'apt-get', True),
+        ("NameError: name 'json' is not defined", 'PIP', False),
+        ("TypeError: func() missing 1 required positional argument: 'x'", 'apt-get', False),
+        ('AssertionError: assert 1 == 2', 'PIP', False),
+    ]
+)
+def test_is_dependency_issue_heuristics(summarized_error, package_manager, expected):
+    generator = object.__new__(Generator)
+    assert generator.is_dependency_issue(summarized_error, '', package_manager) == expected
@@ -0,0 +1,34 @@
+import json
+import os
+
+from langchain.chat_models import ChatOpenAI
+
+from dev_gpt.apis.gpt import _GPTConversation
+from dev_gpt.options.generate.conversation_logger import ConversationLogger
+
+
+def test_chat_stops_streaming_when_stop_condition_is_fulfilled(tmpdir, monkeypatch):
+    os.environ['VERBOSE'] = 'false'
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    tokens = ['Here is the file:\n', '**app.py**\n', '```python\n', 'import json\n', '```', '\nSome explanation', ' nobody needs']
+    streamed_tokens = []
+
+    def fake_completion_with_retry(self, **kwargs):
+        for token in tokens:
+            streamed_tokens.append(token)
+            yield {'choices': [{'delta': {'content': token}}]}
+
+    monkeypatch.setattr(ChatOpenAI, 'completion_with_retry', fake_completion_with_retry)
+    log_file_path = os.path.join(str(tmpdir), 'log.json')
+    conversation = _GPTConversation(
+        'gpt-3.5-turbo', lambda *args: None, [], False, False, ConversationLogger(log_file_path)
+    )
+
+    response = conversation.chat('Write app.py', stop_condition=lambda text: text.count('```') == 2)
+
+    assert response == 'Here is the file:\n**app.py**\n```python\nimport json\n```'
+    assert streamed_tokens == tokens[:5]
+    assert conversation._chat.callback_manager.handlers == []
+    assert conversation.messages[-1].content == response
+    with open(log_file_path, 'r') as f:
+        assert f'content={response!r}' in json.load(f)[-1]['response']
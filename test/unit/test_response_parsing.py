@@ -61,4 +61,63 @@ def test_self_healing_json_parser(init_gpt):
     parsed_json = self_healing_json_parser(json_response)
     for key in ['1', '2', '3', '4']:
         assert key in parsed_json
-        assert 'Change' in parsed_json[key]
\ No newline at end of file
+        assert 'Change' in parsed_json[key]
+
+
+def test_extract_content_from_result_escapes_file_name():
+    plain_text = '**requirementsXtxt**\n```\njina\n```'
+    assert Generator.extract_content_from_result(plain_text, 'requirements.txt') == ''
+    plain_text = '**requirements.txt**\n```\njina\n```'
+    assert Generator.extract_content_from_result(plain_text, 'requirements.txt') == 'jina'
+
+
+def test_files_to_string():
+    files_string = Generator.files_to_string({
+        'requirements.txt': 'jina',
+        'microservice.py': 'import json',
+        'unknown.txt': 'ignored',
+    })
+    assert files_string == '**microservice.py**\n```python\nimport json\n```\n\n**requirements.txt**\n```\njina\n```'
+    assert Generator.files_to_string({'microservice.py': 'import json'}, ['requirements.txt']) == ''
+
+
+def test_extract_files_from_result():
+    plain_text = '''Here are the updated files:
+**microservice.py**
+```python
+import json
+```
+
+**requirements.txt**
+```
+jina
+```
+The test file test_microservice.py stays the same.'''
+    file_names = ['microservice.py', 'test_microservice.py', 'requirements.txt']
+    assert Generator.extract_files_from_result(plain_text, file_names) == {
+        file_name: Generator.extract_content_from_result(plain_text, file_name)
+        for file_name in ['microservice.py', 'requirements.txt']
+    }
+
+
+def test_extract_files_from_result_after_unlabeled_code_block():
+    plain_text = '''Change this:
+
+```python
+result = compute(a, b)
+```
+
+**microservice.py**
+```python
+import json
+```
+
+**requirements.txt**
+```
+jina
+```'''
+    file_names = ['microservice.py', 'test_microservice.py', 'requirements.txt']
+    assert Generator.extract_files_from_result(plain_text, file_names) == {
+        'microservice.py': 'import json',
+        'requirements.txt': 'jina',
+    }